@@ -9,12 +9,10 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+import json
 import sqlite3
-import uuid
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.preprocessing import StandardScaler
-import random
+import threading
+from collections import namedtuple
 
 # Configuration
 st.set_page_config(
@@ -26,11 +24,43 @@ st.set_page_config(
 # Database Setup
 DATABASE_FILE = "mediclin.db"
 
+# WAL + relaxed sync avoids an fsync per commit; memory temp store, a larger
+# page cache, and mmap'd reads keep short queries off the disk entirely.
+PERFORMANCE_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-20000;
+    PRAGMA mmap_size=268435456;
+"""
+
+@st.cache_resource
+def get_conn():
+    """Get the shared SQLite connection (one per server process).
+
+    Streamlit reruns the script on every interaction, so opening and closing
+    a connection per call would pay the connection setup and schema parsing
+    cost on each render. The connection is shared across script-runner
+    threads, so writes must hold the lock returned by get_write_lock().
+    """
+    conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False, isolation_level=None)
+    conn.executescript(PERFORMANCE_PRAGMAS)
+    conn.execute("PRAGMA cache_spill=OFF")
+    conn.set_trace_callback(None)
+    return conn
+
+@st.cache_resource
+def get_write_lock():
+    """Lock serializing writes on the shared connection across reruns"""
+    return threading.Lock()
+
+@st.cache_resource
 def init_database():
-    """Initialize SQLite database for medical data"""
+    """Initialize SQLite database for medical data (once per server process)"""
     conn = sqlite3.connect(DATABASE_FILE)
+    conn.executescript(PERFORMANCE_PRAGMAS)
     cursor = conn.cursor()
-    
+
     # Patients table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS patients (
@@ -68,6 +98,20 @@ def init_database():
         )
     """)
     
+    # Indexes for per-patient lookups and created_at ordering
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_insights_patient
+        ON intelligence_insights(patient_id, created_at DESC)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_meddata_patient
+        ON medical_data(patient_id)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_patients_created
+        ON patients(created_at DESC)
+    """)
+
     conn.commit()
     conn.close()
 
@@ -80,7 +124,9 @@ class MedicalIntelligence:
             "Hypertension", "Diabetes Type 2", "Cardiovascular Disease",
             "Respiratory Issues", "Neurological Conditions", "Metabolic Disorders"
         ]
-        
+        self._conditions_arr = np.array(self.conditions)
+        self._rng = np.random.default_rng()
+
     def analyze_patient(self, patient_data):
         """Analyze patient data using MediClin"""
         insights = []
@@ -116,69 +162,132 @@ class MedicalIntelligence:
         
         return insights
     
-    def predict_conditions(self, patient_data):
+    def predict_conditions(self, patient_data, rng=None):
         """Predict potential medical conditions"""
-        predictions = []
-        
-        for condition in self.conditions:
-            confidence = random.uniform(0.1, 0.9)
-            risk_level = "High" if confidence > 0.7 else "Medium" if confidence > 0.4 else "Low"
-            
-            predictions.append({
-                "condition": condition,
-                "confidence": confidence,
-                "risk_level": risk_level
-            })
-        
-        return sorted(predictions, key=lambda x: x['confidence'], reverse=True)[:4]
+        rng = rng if rng is not None else self._rng
+        confidence = rng.uniform(0.1, 0.9, self._conditions_arr.size)
+
+        # Top 4 by confidence, descending, without a full Python sort
+        idx = np.argpartition(-confidence, 4)[:4]
+        idx = idx[np.argsort(-confidence[idx])]
+        risk_level = np.select([confidence > 0.7, confidence > 0.4], ["High", "Medium"], "Low")
+
+        return [
+            {
+                "condition": str(self._conditions_arr[i]),
+                "confidence": float(confidence[i]),
+                "risk_level": str(risk_level[i])
+            }
+            for i in idx
+        ]
 
 # Database Functions
+Patient = namedtuple('Patient', ['patient_id', 'name', 'age', 'gender', 'medical_history'])
+
+# Hot-path SQL as module-level literals so every call presents the same
+# statement text and hits SQLite's per-connection prepared-statement cache
+SQL_INSERT_PATIENT = """
+    INSERT INTO patients (patient_id, name, age, gender, medical_history)
+    VALUES ('', ?, ?, ?, ?)
+"""
+SQL_SET_PATIENT_ID = "UPDATE patients SET patient_id = ? WHERE id = ?"
+SQL_INSERT_INSIGHT = """
+    INSERT INTO intelligence_insights (patient_id, insight_type, insight_text, confidence)
+    VALUES (?, ?, ?, ?)
+"""
+SQL_COUNT_PATIENTS = "SELECT COUNT(*) FROM patients"
+SQL_SELECT_PATIENTS = """
+    SELECT patient_id, name, age, gender, medical_history
+    FROM patients ORDER BY created_at DESC
+"""
+SQL_SELECT_PATIENT = """
+    SELECT patient_id, name, age, gender, medical_history
+    FROM patients WHERE patient_id = ?
+"""
+
 def add_patient(name, age, gender, medical_history):
     """Add patient to database"""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    
-    patient_id = f"MI-{str(uuid.uuid4())[:8].upper()}"
-    
-    cursor.execute("""
-        INSERT INTO patients (patient_id, name, age, gender, medical_history)
-        VALUES (?, ?, ?, ?, ?)
-    """, (patient_id, name, age, gender, medical_history))
-    
-    conn.commit()
-    conn.close()
+    conn = get_conn()
+    with get_write_lock():
+        # Derive the patient ID from the AUTOINCREMENT rowid: monotonic,
+        # collision-free, and no per-insert urandom syscall
+        conn.execute("BEGIN")
+        try:
+            cursor = conn.execute(SQL_INSERT_PATIENT, (name, age, gender, medical_history))
+            patient_id = f"MI-{cursor.lastrowid:08X}"
+            conn.execute(SQL_SET_PATIENT_ID, (patient_id, cursor.lastrowid))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    fetch_dashboard_metrics.clear()
+    get_all_patients_df.clear()
+    get_patient.clear()
+    st.session_state.patients_dirty = True
     return patient_id
 
-def get_all_patients():
-    """Get all patients"""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute("SELECT * FROM patients ORDER BY created_at DESC")
-    patients = cursor.fetchall()
-    
-    conn.close()
-    return patients
+@st.cache_data(ttl=30)
+def fetch_dashboard_metrics():
+    """Get the dashboard counts from a single COUNT(*) query"""
+    total = get_conn().execute(SQL_COUNT_PATIENTS).fetchone()[0]
+    return total, total * 3, total * 5
 
-def save_intelligence_insight(patient_id, insight_type, insight_text, confidence):
-    """Save intelligence insight to database"""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        INSERT INTO intelligence_insights (patient_id, insight_type, insight_text, confidence)
-        VALUES (?, ?, ?, ?)
-    """, (patient_id, insight_type, insight_text, confidence))
-    
-    conn.commit()
-    conn.close()
+@st.cache_data(ttl=60)
+def get_all_patients_df():
+    """Get all patients as a DataFrame, newest first"""
+    return pd.read_sql_query(SQL_SELECT_PATIENTS, get_conn())
+
+@st.cache_data(ttl=60)
+def get_patient(patient_id):
+    """Get a single patient row by patient_id"""
+    row = get_conn().execute(SQL_SELECT_PATIENT, (patient_id,)).fetchone()
+    return Patient(*row) if row else None
+
+def save_insights_bulk(patient_id, insights):
+    """Save a batch of intelligence insights in a single transaction"""
+    rows = [(patient_id, i['type'], i['insight'], i['confidence']) for i in insights]
+
+    conn = get_conn()
+    with get_write_lock():
+        # One BEGIN/COMMIT around executemany: a single fsync for the batch
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(SQL_INSERT_INSIGHT, rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+@st.cache_resource
+def get_engine():
+    """Get the shared MedicalIntelligence engine (one per server process)"""
+    return MedicalIntelligence()
 
-# Initialize
-init_database()
-medical_ai = MedicalIntelligence()
+@st.cache_data
+def analyze_patient_cached(age, gender, medical_history):
+    """Analyze a patient, memoized on the patient attributes"""
+    patient_data = {"age": age, "gender": gender, "medical_history": medical_history}
+    return get_engine().analyze_patient(patient_data)
+
+@st.cache_data
+def predict_conditions_cached(patient_id):
+    """Predict conditions, seeded by patient_id so reruns are stable"""
+    rng = np.random.default_rng(hash(patient_id) & 0xFFFFFFFF)
+    return get_engine().predict_conditions({}, rng=rng)
 
 # Main Application
 def main():
+    init_database()
+
+    # Fetch the patient list once per rerun; pages read it from session
+    # state so a nav click doesn't trigger the query (or cache hash) twice.
+    # The cache_data layer absorbs the per-rerun cost within its TTL; the
+    # dirty flag just forces a refetch past that TTL after a write.
+    if st.session_state.pop('patients_dirty', False):
+        get_all_patients_df.clear()
+    st.session_state.patients = get_all_patients_df()
+
     st.title("🧠 MediClin Platform")
     st.subheader("AI-Powered Medical Analysis & Diagnostic Intelligence")
     
@@ -217,6 +326,25 @@ def main():
     elif page == "Medical Insights":
         medical_insights_page()
 
+@st.cache_data
+def build_dashboard_pie(values, names):
+    """Build and serialize the distribution pie, keyed by its data"""
+    fig = px.pie(values=list(values), names=list(names),
+                 title="MediClin Distribution")
+    return fig.to_json()
+
+@st.cache_data
+def build_accuracy_chart():
+    """Build and serialize the diagnostic accuracy line chart (static data)"""
+    months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun"]
+    accuracy = [92.1, 93.5, 94.2, 93.8, 95.1, 94.7]
+
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=months, y=accuracy, mode='lines+markers', name='Accuracy'))
+    fig.update_layout(title="Diagnostic Intelligence Accuracy Over Time",
+                     yaxis_title="Accuracy (%)", xaxis_title="Month")
+    return fig.to_json()
+
 def dashboard_page():
     """MediClin Dashboard"""
     st.header("MediClin Dashboard")
@@ -224,26 +352,24 @@ def dashboard_page():
     # Key metrics
     col1, col2, col3, col4 = st.columns(4)
     
-    patients = get_all_patients()
-    
+    total_patients, ai_analyses, insight_count = fetch_dashboard_metrics()
+
     with col1:
-        st.metric("Total Patients", len(patients))
+        st.metric("Total Patients", total_patients)
     with col2:
-        st.metric("AI Analyses", len(patients) * 3)
+        st.metric("AI Analyses", ai_analyses)
     with col3:
-        st.metric("Intelligence Insights", len(patients) * 5)
+        st.metric("Intelligence Insights", insight_count)
     with col4:
         st.metric("Accuracy Rate", "94.2%")
-    
+
     # Intelligence overview chart
-    if patients:
-        # Create sample intelligence data
-        intelligence_types = ["Risk Assessment", "Diagnostic Intelligence", "Preventive Care", "Treatment Optimization"]
-        values = [25, 30, 20, 25]
-        
-        fig = px.pie(values=values, names=intelligence_types, 
-                     title="MediClin Distribution")
-        st.plotly_chart(fig, use_container_width=True)
+    if total_patients:
+        intelligence_types = ("Risk Assessment", "Diagnostic Intelligence", "Preventive Care", "Treatment Optimization")
+        values = (25, 30, 20, 25)
+
+        fig_spec = json.loads(build_dashboard_pie(values, intelligence_types))
+        st.plotly_chart(fig_spec, use_container_width=True)
     
     # Recent intelligence insights
     st.subheader("Recent Intelligence Insights")
@@ -284,8 +410,7 @@ def patient_analysis_page():
                     st.success(f"Patient added with ID: {patient_id}")
                     
                     # Immediate intelligence analysis
-                    patient_data = {"age": age, "gender": gender, "medical_history": medical_history}
-                    insights = medical_ai.analyze_patient(patient_data)
+                    insights = analyze_patient_cached(age, gender, medical_history)
                     
                     st.subheader("Immediate Intelligence Analysis")
                     for insight in insights:
@@ -293,33 +418,32 @@ def patient_analysis_page():
                         st.write(insight['insight'])
                         st.write("Recommendations:", ", ".join(insight['recommendations']))
                         st.write("---")
-                        
-                        # Save to database
-                        save_intelligence_insight(patient_id, insight['type'], insight['insight'], insight['confidence'])
-                    
+
+                    # Save to database in one batch
+                    save_insights_bulk(patient_id, insights)
+
                     st.rerun()
     
     with tab2:
         st.subheader("Analyze Existing Patients")
         
-        patients = get_all_patients()
-        if patients:
-            patient_options = [f"{p[2]} (ID: {p[1]})" for p in patients]
-            selected = st.selectbox("Select Patient", patient_options)
-            
-            if selected:
-                patient_id = selected.split("ID: ")[1].rstrip(")")
-                selected_patient = next(p for p in patients if p[1] == patient_id)
-                
+        patients_df = st.session_state.patients
+        if not patients_df.empty:
+            # Keep the real patient_id as the selectbox value; format_func
+            # handles display, so no string parsing on the way back
+            names = dict(zip(patients_df['patient_id'], patients_df['name']))
+            patient_id = st.selectbox("Select Patient", patients_df['patient_id'].tolist(),
+                                      format_func=lambda pid: f"{names[pid]} (ID: {pid})")
+
+            if patient_id:
+                selected_patient = get_patient(patient_id)
+
                 if st.button("Run Intelligence Analysis"):
-                    patient_data = {
-                        "age": selected_patient[3],
-                        "gender": selected_patient[4],
-                        "medical_history": selected_patient[5]
-                    }
-                    
-                    insights = medical_ai.analyze_patient(patient_data)
-                    predictions = medical_ai.predict_conditions(patient_data)
+                    insights = analyze_patient_cached(
+                        selected_patient.age, selected_patient.gender,
+                        selected_patient.medical_history
+                    )
+                    predictions = predict_conditions_cached(patient_id)
                     
                     col1, col2 = st.columns(2)
                     
@@ -367,21 +491,12 @@ def diagnostic_intelligence_page():
     
     with col2:
         st.subheader("Diagnostic Accuracy")
-        
-        # Create accuracy chart
-        months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun"]
-        accuracy = [92.1, 93.5, 94.2, 93.8, 95.1, 94.7]
-        
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(x=months, y=accuracy, mode='lines+markers', name='Accuracy'))
-        fig.update_layout(title="Diagnostic Intelligence Accuracy Over Time", 
-                         yaxis_title="Accuracy (%)", xaxis_title="Month")
-        st.plotly_chart(fig, use_container_width=True)
 
-def medical_insights_page():
-    """Medical Insights Module"""
-    st.header("MediClin Insights")
-    
+        st.plotly_chart(json.loads(build_accuracy_chart()), use_container_width=True)
+
+@st.cache_data
+def build_insight_listing():
+    """Precompute insight categories with stable confidence scores"""
     # Intelligence categories with direct display (no expanders)
     insight_categories = {
         "Preventive Intelligence": [
@@ -405,32 +520,27 @@ def medical_insights_page():
             "Long-term outcome probability assessment"
         ]
     }
-    
-    # Display in columns for better layout
+
+    rng = np.random.default_rng()
+    return [
+        (category, [(insight, float(rng.uniform(0.8, 0.95))) for insight in insights])
+        for category, insights in insight_categories.items()
+    ]
+
+def medical_insights_page():
+    """Medical Insights Module"""
+    st.header("MediClin Insights")
+
+    # Display in columns for better layout, alternating left/right
     col1, col2 = st.columns(2)
-    
-    categories = list(insight_categories.items())
-    
-    with col1:
-        for i in range(0, len(categories), 2):
-            category, insights = categories[i]
+
+    for i, (category, insights) in enumerate(build_insight_listing()):
+        with col1 if i % 2 == 0 else col2:
             st.subheader(f"🧠 {category}")
-            for insight in insights:
+            for insight, confidence in insights:
                 st.write(f"• {insight}")
-                confidence = random.uniform(0.8, 0.95)
                 st.write(f"  Confidence: {confidence:.1%}")
             st.write("---")
-    
-    with col2:
-        for i in range(1, len(categories), 2):
-            if i < len(categories):
-                category, insights = categories[i]
-                st.subheader(f"🧠 {category}")
-                for insight in insights:
-                    st.write(f"• {insight}")
-                    confidence = random.uniform(0.8, 0.95)
-                    st.write(f"  Confidence: {confidence:.1%}")
-                st.write("---")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file